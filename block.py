@@ -1,3 +1,14 @@
+import logging
+
+from metrics import registry as metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.histogram(
+    "reorg_depth_blocks", "Blocks rolled back per reorg", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+
 class Block:
     def __init__(self, index, prev_hash, transactions, nonce, miner):
         self.index = index
@@ -6,26 +17,36 @@ class Block:
         self.nonce = nonce
         self.miner = miner
         self.block_id = f"block_{index}_{nonce}"
+        self.utxo_commitment = None  # UTXO set commitment after this block, set when connected
+        self.spent_utxos = None  # Undo data: (tx_id, index, amount, owner) spent by this block
 
 
 class Blockchain:
-    def __init__(self, utxo_manager):
+    def __init__(self, utxo_manager, tx_index=None):
         self.main_chain = []
         self.side_chains = {}  # Maps tip_block_id -> list of blocks
         self.utxo_manager = utxo_manager
         self.block_map = {}    # Maps block_id -> Block for quick lookup
+        self.tx_index = tx_index  # Optional TxIndex over the main chain
 
     def add_block(self, new_block):
         """
         Add a block and handle fork resolution with chain reorganization.
         Implements "longest chain wins" rule with proper reorg.
         """
-        
+        with metrics.timer("block_connect"):
+            return self._add_block(new_block)
+
+    def _add_block(self, new_block):
         # Check if this block extends the main chain
         if not self.main_chain or new_block.prev_hash == self.main_chain[-1].block_id:
             self.main_chain.append(new_block)
             self.block_map[new_block.block_id] = new_block
-            print(f"Block {new_block.index} added to main chain.")
+            new_block.utxo_commitment = self.utxo_manager.commitment()
+            if self.tx_index is not None:
+                self.tx_index.connect_block(new_block)
+            metrics.inc("blocks_connected_total")
+            logger.info("Block %s added to main chain.", new_block.index)
             return True
         
         # Check if this block extends any existing chain (main or side)
@@ -37,14 +58,16 @@ class Blockchain:
                 # This creates a side chain at the fork point
                 self.side_chains[new_block.block_id] = [new_block]
                 self.block_map[new_block.block_id] = new_block
-                print(f"Side chain detected. Storing block {new_block.index}.")
+                metrics.inc("side_chain_blocks_total")
+                logger.info("Side chain detected. Storing block %s.", new_block.index)
             else:
                 # Parent is in a side chain, extend it
                 for chain_tip, chain in list(self.side_chains.items()):
                     if chain[-1].block_id == new_block.prev_hash:
                         chain.append(new_block)
                         self.block_map[new_block.block_id] = new_block
-                        print(f"Block {new_block.index} extends side chain.")
+                        metrics.inc("side_chain_blocks_total")
+                        logger.info("Block %s extends side chain.", new_block.index)
                         break
             
             # Check if reorganization is needed
@@ -52,7 +75,12 @@ class Blockchain:
             return False
         
         # Orphan block (parent not found) - could be stored for later
-        print(f"Block {new_block.index} is orphaned (parent {new_block.prev_hash} not found).")
+        metrics.inc("orphan_blocks_total")
+        logger.warning(
+            "Block %s is orphaned (parent %s not found).",
+            new_block.index,
+            new_block.prev_hash,
+        )
         return False
 
     def _is_in_main_chain(self, block_id):
@@ -86,31 +114,57 @@ class Blockchain:
             # Find common ancestor
             common_ancestor_idx = self._find_common_ancestor(longest_side_chain[0].prev_hash)
             
-            print(f"\n--- CHAIN REORGANIZATION (REORG) ---")
-            print(f"Main chain length: {len(self.main_chain)}")
-            print(f"Side chain length: {longest_length}")
-            print(f"Common ancestor at main chain index: {common_ancestor_idx}\n")
-            
-            # Rollback main chain blocks after fork point
-            blocks_to_rollback = self.main_chain[common_ancestor_idx + 1:]
-            self._rollback_blocks(blocks_to_rollback)
-            print(f"Rolled back {len(blocks_to_rollback)} blocks from main chain.")
-            
-            # Truncate main chain at fork point
-            self.main_chain = self.main_chain[:common_ancestor_idx + 1]
-            
-            # Apply side chain blocks to UTXO manager
-            for block in longest_side_chain:
-                self._apply_block_to_utxo(block)
-            
-            # Promote side chain to main chain
-            self.main_chain.extend(longest_side_chain)
-            
-            # Remove this side chain
-            del self.side_chains[longest_tip]
-            
-            print(f"Main chain updated. New tip: {self.main_chain[-1].block_id}")
-            print(f"--- END REORG ---\n")
+            logger.warning(
+                "Chain reorganization: main chain length %d, side chain length %d, "
+                "common ancestor at main chain index %d",
+                len(self.main_chain),
+                longest_length,
+                common_ancestor_idx,
+            )
+            with metrics.timer("reorg"):
+                rolled_back = self._reorganize(
+                    longest_tip, longest_side_chain, common_ancestor_idx
+                )
+            metrics.inc("reorgs_total")
+            metrics.observe("reorg_depth_blocks", rolled_back)
+            logger.warning("Reorg complete. New tip: %s", self.main_chain[-1].block_id)
+
+    def _reorganize(self, side_tip, side_chain, common_ancestor_idx):
+        """
+        Replace the main chain after the fork point with the given side chain.
+        Returns the number of blocks rolled back.
+        """
+        # Rollback main chain blocks after fork point
+        blocks_to_rollback = self.main_chain[common_ancestor_idx + 1:]
+        self._rollback_blocks(blocks_to_rollback)
+        logger.info("Rolled back %d blocks from main chain.", len(blocks_to_rollback))
+        
+        # Truncate main chain at fork point
+        self.main_chain = self.main_chain[:common_ancestor_idx + 1]
+        
+        # The UTXO set should now match the one recorded at the fork point
+        if self.main_chain:
+            expected = self.main_chain[-1].utxo_commitment
+            if expected is not None and expected != self.utxo_manager.commitment():
+                metrics.inc("reorg_commitment_mismatch_total")
+                logger.warning(
+                    "UTXO commitment after rollback does not match block %s",
+                    self.main_chain[-1].block_id,
+                )
+        
+        # Apply side chain blocks to UTXO manager
+        for block in side_chain:
+            self.apply_block_to_utxo(block)
+            block.utxo_commitment = self.utxo_manager.commitment()
+            if self.tx_index is not None:
+                self.tx_index.connect_block(block)
+        
+        # Promote side chain to main chain
+        self.main_chain.extend(side_chain)
+        
+        # Remove this side chain
+        del self.side_chains[side_tip]
+        return len(blocks_to_rollback)
 
     def _find_common_ancestor(self, block_id):
         """
@@ -136,16 +190,37 @@ class Blockchain:
         
         return -1  # No common ancestor (shouldn't happen)
 
-    def _apply_block_to_utxo(self, block):
-        """Apply a block's transactions to the UTXO manager."""
+    def apply_block_to_utxo(self, block, output_hashes=None):
+        """
+        Apply a block's transactions and its coinbase reward to the UTXO manager,
+        recording the spent UTXOs on the block so a rollback can restore them.
+        `output_hashes` optionally gives precomputed entry hashes for every
+        output, in block order. Returns the total fees paid to the miner.
+        """
+        hashes = iter(output_hashes) if output_hashes is not None else None
+        spent = []
+        total_fees = 0.0
         for tx in block.transactions:
+            in_sum = 0.0
             # Remove spent inputs
             for inp in tx.inputs:
+                utxo_data = self.utxo_manager.get_utxo(inp.prev_tx, inp.index)
+                if utxo_data is not None:
+                    amount, owner = utxo_data
+                    spent.append((inp.prev_tx, inp.index, amount, owner))
+                    in_sum += amount
                 self.utxo_manager.remove_utxo(inp.prev_tx, inp.index)
             
             # Add new outputs
             for i, out in enumerate(tx.outputs):
-                self.utxo_manager.add_utxo(tx.tx_id, i, out.amount, out.address)
+                entry_hash = next(hashes) if hashes is not None else None
+                self.utxo_manager.add_utxo(tx.tx_id, i, out.amount, out.address, entry_hash)
+            total_fees += in_sum - sum(out.amount for out in tx.outputs)
+
+        coinbase_id = f"coinbase_{block.block_id}"
+        self.utxo_manager.add_utxo(coinbase_id, 0, total_fees, block.miner)
+        block.spent_utxos = spent
+        return total_fees
 
     def _rollback_blocks(self, blocks):
         """
@@ -153,6 +228,11 @@ class Blockchain:
         Removes outputs and re-adds spent inputs.
         """
         for block in reversed(blocks):
+            undo = {}
+            if block.spent_utxos is not None:
+                for tx_id, index, amount, owner in block.spent_utxos:
+                    undo[(tx_id, index)] = (amount, owner)
+
             # Rollback transactions in reverse order
             for tx in reversed(block.transactions):
                 # Remove outputs added by this transaction
@@ -161,8 +241,11 @@ class Blockchain:
                 
                 # Re-add spent inputs from previous blocks
                 for inp in tx.inputs:
-                    # Find the UTXO in the remaining main chain
-                    utxo_data = self._find_utxo_before_fork(inp.prev_tx, inp.index)
+                    # Prefer the block's undo data; it also covers outputs
+                    # created outside the chain, such as genesis UTXOs
+                    utxo_data = undo.get((inp.prev_tx, inp.index))
+                    if utxo_data is None:
+                        utxo_data = self._find_utxo_before_fork(inp.prev_tx, inp.index)
                     if utxo_data:
                         amount, owner = utxo_data
                         self.utxo_manager.add_utxo(inp.prev_tx, inp.index, amount, owner)
@@ -171,8 +254,21 @@ class Blockchain:
             coinbase_id = f"coinbase_{block.block_id}"
             self.utxo_manager.remove_utxo(coinbase_id, 0)
 
+            if self.tx_index is not None:
+                self.tx_index.disconnect_block(block)
+
     def _find_utxo_before_fork(self, tx_id, index):
         """Find a UTXO in the current main chain."""
+        if self.tx_index is not None:
+            location = self.tx_index.get_tx_location(tx_id)
+            if location is None:
+                return None
+            block_id, position = location
+            tx = self.block_map[block_id].transactions[position]
+            if index < len(tx.outputs):
+                return (tx.outputs[index].amount, tx.outputs[index].address)
+            return None
+
         for block in self.main_chain:
             for tx in block.transactions:
                 if tx.tx_id == tx_id and index < len(tx.outputs):
@@ -0,0 +1,170 @@
+import bisect
+
+SATOSHIS_PER_BTC = 100_000_000
+
+
+def estimate_tx_size(num_inputs: int, num_outputs: int) -> int:
+    """Approximate serialized size in bytes (P2PKH-style inputs and outputs)."""
+    return 10 + 148 * num_inputs + 34 * num_outputs
+
+
+def fee_rate_of(fee: float, num_inputs: int, num_outputs: int) -> float:
+    """Fee rate in satoshis per byte."""
+    return fee * SATOSHIS_PER_BTC / estimate_tx_size(num_inputs, num_outputs)
+
+
+class FeeEstimator:
+    """
+    Exponentially decayed fee-rate buckets, in the spirit of Bitcoin Core's
+    block policy estimator.
+
+    Each mempool entry is tracked with its bucket and the height it arrived at.
+    When it confirms after k blocks, confirmed_within[bucket][t] is bumped for
+    every target t >= k; evicted entries count as failures. These counters
+    decay by `decay` per block, so recent blocks dominate. Entries still
+    waiting are counted in waiting_past[bucket][t] once they have been passed
+    over by more than t blocks, so slow buckets are not judged only on the
+    transactions that did confirm. Estimates walk the buckets once, from the
+    highest fee rate down: O(buckets).
+
+    Transactions paying less than `min_rate` are not tracked at all, so a
+    zero-fee transaction never vouches for the lowest bucket. As in Bitcoin
+    Core, an estimate needs sufficient_txs_per_block / (1 - decay) decayed
+    samples: about 50 with the defaults, not a single confirmation.
+    """
+
+    def __init__(
+        self,
+        max_target=25,
+        decay=0.998,
+        min_rate=1.0,
+        max_rate=10_000.0,
+        spacing=1.1,
+        sufficient_txs_per_block=0.1,
+    ):
+        self.max_target = max_target
+        self.decay = decay
+        self.height = 0
+        self.min_samples = sufficient_txs_per_block / (1 - decay)
+
+        self.bucket_bounds = []  # Lower bound (sat/byte) of each bucket
+        rate = min_rate
+        while rate <= max_rate:
+            self.bucket_bounds.append(rate)
+            rate *= spacing
+        num_buckets = len(self.bucket_bounds)
+
+        self.confirmed_within = [[0.0] * max_target for _ in range(num_buckets)]
+        self.confirmed_total = [0.0] * num_buckets
+        self.failed = [0.0] * num_buckets
+        # waiting_past[b][t]: tracked txs in bucket b left unconfirmed by more than t blocks
+        self.waiting_past = [[0] * max_target for _ in range(num_buckets)]
+        self.cohorts = {}  # Maps entry height -> tracked tx count per bucket (recent heights)
+        self.tracked = {}  # Maps tx_id -> (bucket, entry height)
+
+    def _bucket_for(self, rate: float):
+        """Bucket index for a fee rate, or None below the lowest bucket."""
+        bucket = bisect.bisect_right(self.bucket_bounds, rate) - 1
+        return bucket if bucket >= 0 else None
+
+    def process_entry(self, tx, fee: float):
+        """Start tracking a transaction that was just accepted into the mempool."""
+        self.untrack(tx.tx_id)
+        rate = fee_rate_of(fee, len(tx.inputs), len(tx.outputs))
+        bucket = self._bucket_for(rate)
+        if bucket is None:
+            return
+        self.tracked[tx.tx_id] = (bucket, self.height)
+        if self.height not in self.cohorts:
+            self.cohorts[self.height] = [0] * len(self.bucket_bounds)
+        self.cohorts[self.height][bucket] += 1
+
+    def _stop_waiting(self, tx_id: str):
+        """Stop tracking tx_id and drop it from the waiting counts. Returns its entry."""
+        entry = self.tracked.pop(tx_id, None)
+        if entry is None:
+            return None
+        bucket, entry_height = entry
+        age = min(self.height - entry_height, self.max_target)
+        row = self.waiting_past[bucket]
+        for t in range(age):
+            row[t] -= 1
+        cohort = self.cohorts.get(entry_height)
+        if cohort is not None:
+            cohort[bucket] -= 1
+        return entry
+
+    def process_eviction(self, tx_id: str):
+        """A tracked transaction left the mempool without confirming."""
+        entry = self._stop_waiting(tx_id)
+        if entry is not None:
+            self.failed[entry[0]] += 1
+
+    def untrack(self, tx_id: str):
+        """Forget a transaction without recording an outcome."""
+        self._stop_waiting(tx_id)
+
+    def process_block(self, transactions):
+        """Decay the history and record the confirmations in a newly mined block."""
+        self.height += 1
+        decay = self.decay
+        for b in range(len(self.bucket_bounds)):
+            row = self.confirmed_within[b]
+            for t in range(self.max_target):
+                row[t] *= decay
+            self.confirmed_total[b] *= decay
+            self.failed[b] *= decay
+
+        # Every still-tracked cohort has now been passed over by one more block.
+        # Its txs in this block are removed again by _stop_waiting below.
+        for entry_height in list(self.cohorts):
+            age = self.height - entry_height
+            if age > self.max_target:
+                del self.cohorts[entry_height]
+                continue
+            for b, count in enumerate(self.cohorts[entry_height]):
+                if count:
+                    self.waiting_past[b][age - 1] += count
+
+        for tx in transactions:
+            entry = self._stop_waiting(tx.tx_id)
+            if entry is None:
+                continue
+            bucket, entry_height = entry
+            blocks_waited = max(self.height - entry_height, 1)
+            self.confirmed_total[bucket] += 1
+            row = self.confirmed_within[bucket]
+            for t in range(blocks_waited - 1, self.max_target):
+                row[t] += 1
+
+    def estimate_fee_rate(self, target_blocks: int, success_threshold=0.85, min_samples=None):
+        """
+        Lowest bucket fee rate (sat/byte) such that transactions paying at least
+        that much confirmed within `target_blocks` with the given probability.
+        Returns None if there is not enough history yet.
+        """
+        if min_samples is None:
+            min_samples = self.min_samples
+        t = min(max(target_blocks, 1), self.max_target) - 1
+        best = None
+        confirmed = 0.0
+        total = 0.0
+        for b in range(len(self.bucket_bounds) - 1, -1, -1):
+            bucket_total = self.confirmed_total[b] + self.failed[b] + self.waiting_past[b][t]
+            if not bucket_total:
+                continue
+            confirmed += self.confirmed_within[b][t]
+            total += bucket_total
+            if total < min_samples:
+                continue
+            if confirmed / total < success_threshold:
+                break
+            best = b
+        return self.bucket_bounds[best] if best is not None else None
+
+    def estimate_fee(self, num_inputs: int, num_outputs: int, target_blocks: int = 2):
+        """Fee in BTC for a transaction of the given shape, or None without history."""
+        rate = self.estimate_fee_rate(target_blocks)
+        if rate is None:
+            return None
+        return rate * estimate_tx_size(num_inputs, num_outputs) / SATOSHIS_PER_BTC
@@ -0,0 +1,191 @@
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+# Fold the overlay into a fresh base copy once it holds this fraction of the set
+COMPACT_FRACTION = 8
+
+
+class UTXOSetView(Mapping):
+    """
+    Read-only UTXO set for one snapshot: a base dict copied at some earlier
+    generation plus an overlay of the changes since then (None = removed).
+    Neither dict is mutated after publication, so views can share them.
+    """
+
+    def __init__(self, base, overlay, size):
+        self.base = base
+        self.overlay = overlay
+        self.size = size
+
+    def __getitem__(self, key):
+        if key in self.overlay:
+            value = self.overlay[key]
+            if value is None:
+                raise KeyError(key)
+            return value
+        return self.base[key]
+
+    def get(self, key, default=None):
+        value = self.overlay.get(key, self)
+        if value is self:
+            return self.base.get(key, default)
+        return default if value is None else value
+
+    def __iter__(self):
+        for key, _ in self.entries():
+            yield key
+
+    def __len__(self):
+        return self.size
+
+    def entries(self):
+        """Iterate (key, (amount, owner)) pairs without a lookup per key."""
+        if not self.overlay:
+            return self.base.items()
+        return self._merged_entries()
+
+    def _merged_entries(self):
+        overlay = self.overlay
+        for key, value in self.base.items():
+            if key not in overlay:
+                yield key, value
+        for key, value in overlay.items():
+            if value is not None:
+                yield key, value
+
+
+class LedgerSnapshot:
+    """
+    Immutable, point-in-time view of the UTXO set, mempool and chain tip.
+    Every query against one snapshot sees the same generation of state.
+    """
+
+    def __init__(self, generation, utxo_set, mempool_entries, tip, height, utxo_commitment):
+        self.generation = generation
+        self.utxo_set = utxo_set  # UTXOSetView
+        self.utxo_commitment = utxo_commitment
+        self.mempool_entries = mempool_entries  # (fee, Transaction) tuple, highest fee first
+        self.tip = tip
+        self.height = height
+
+    def get_balance(self, owner: str):
+        """Calculate total balance for an address ."""
+        return sum(amount for _, amount in self._owned_by(owner))
+
+    def get_utxo(self, tx_id: str, index: int):
+        """Returns (amount, owner) or None if not found"""
+        return self.utxo_set.get((tx_id, index))
+
+    def get_utxos_for_owner(self, owner: str) -> list:
+        """Get all UTXOs owned by an address ."""
+        return [[tx_id, index, amount] for (tx_id, index), amount in self._owned_by(owner)]
+
+    def _owned_by(self, owner):
+        # Match the owner first, so the overlay is only consulted for hits
+        base, overlay = self.utxo_set.base, self.utxo_set.overlay
+        owned = [
+            (key, amount)
+            for key, (amount, utxo_owner) in base.items()
+            if utxo_owner == owner and key not in overlay
+        ]
+        owned.extend(
+            (key, value[0])
+            for key, value in overlay.items()
+            if value is not None and value[1] == owner
+        )
+        return owned
+
+    def view_mempool(self) -> list:
+        """Return (tx_id, fee, num_inputs, num_outputs) for every mempool transaction."""
+        return [
+            (tx.tx_id, fee, len(tx.inputs), len(tx.outputs))
+            for fee, tx in self.mempool_entries
+        ]
+
+
+class LedgerView:
+    """
+    Single-writer / many-reader access to a UTXOManager, Mempool and Blockchain.
+
+    The writer mutates the live objects inside `write()`. When the write ends,
+    the writer bumps the generation and publishes a new LedgerSnapshot.
+    Readers call `snapshot()`, which returns the last published snapshot
+    without taking any lock, so reads never wait on a write in progress and
+    writes never wait on readers.
+
+    Publishing is copy-on-write. The UTXO manager's change log gives the
+    entries touched by the write, and they are layered over the previous
+    snapshot's set. The whole set is copied again only once the overlay
+    outgrows 1/COMPACT_FRACTION of it. The mempool is re-sorted only when
+    its version changed. A write that only admits a transaction therefore
+    leaves the UTXO set shared.
+    """
+
+    def __init__(self, utxo_manager, mempool, blockchain=None):
+        self.utxo_manager = utxo_manager
+        self.mempool = mempool
+        self.blockchain = blockchain
+        self.generation = 0
+        self._write_lock = threading.RLock()
+        self._snapshot = None
+        self._mempool_version = None
+        self._snapshot = self._build_snapshot()
+
+    @contextmanager
+    def write(self):
+        """Hold exclusive write access; publishes a new snapshot on exit."""
+        with self._write_lock:
+            try:
+                yield
+            finally:
+                self.generation += 1
+                # Replacing the reference is atomic, so readers see either
+                # the previous snapshot or this one, never a partial state.
+                self._snapshot = self._build_snapshot()
+
+    def snapshot(self) -> LedgerSnapshot:
+        """Return the snapshot for the latest completed write."""
+        return self._snapshot
+
+    def _build_utxo_view(self, previous):
+        live = self.utxo_manager.utxo_set
+        changes = self.utxo_manager.change_log
+        self.utxo_manager.change_log = {}
+        if previous is None or changes is None:
+            return UTXOSetView(dict(live), {}, len(live))
+        if not changes:
+            return previous
+        # Copying n entries at most once per n / COMPACT_FRACTION changes keeps
+        # publishing O(changes) amortized while bounding the overlay readers scan.
+        if len(previous.overlay) + len(changes) > len(live) // COMPACT_FRACTION:
+            return UTXOSetView(dict(live), {}, len(live))
+        overlay = dict(previous.overlay)
+        overlay.update(changes)
+        return UTXOSetView(previous.base, overlay, len(live))
+
+    def _build_snapshot(self) -> LedgerSnapshot:
+        previous = self._snapshot
+        utxo_set = self._build_utxo_view(previous.utxo_set if previous is not None else None)
+
+        mempool_version = self.mempool.version
+        if previous is not None and self._mempool_version == mempool_version:
+            mempool_entries = previous.mempool_entries
+        else:
+            entries = sorted(self.mempool.transactions)
+            mempool_entries = tuple((-neg_fee, tx) for neg_fee, tx in entries)
+        self._mempool_version = mempool_version
+
+        tip, height = "0", 0
+        if self.blockchain is not None:
+            tip = self.blockchain.get_main_chain_tip()
+            height = len(self.blockchain.main_chain)
+
+        return LedgerSnapshot(
+            self.generation,
+            utxo_set,
+            mempool_entries,
+            tip,
+            height,
+            self.utxo_manager.commitment(),
+        )
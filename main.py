@@ -1,12 +1,24 @@
+import logging
+import os
 import sys
 
+import mempool_store
+import metrics
 import mining
 import test_cases
 from block import Blockchain
+from fee_estimator import FeeEstimator
+from ledger_view import LedgerView
 from mempool import Mempool
+from query_server import QueryServer
 from transaction import Input, Output, Transaction, generate_tx_id
+from tx_index import TxIndex
 from utxo_manager import UTXOManager
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEE = 0.001
+
 
 def initialize_genesis(utxo_manager):
     """
@@ -48,7 +60,16 @@ def print_menu(utxo_manager):
     print("6. Exit")
 
 
-def create_transaction_cli(utxo_manager, mempool):
+def choose_fee(mempool, num_inputs, num_outputs, target_blocks=2):
+    """Estimated fee for confirmation within target_blocks, or DEFAULT_FEE without history."""
+    if mempool.fee_estimator is not None:
+        fee = mempool.fee_estimator.estimate_fee(num_inputs, num_outputs, target_blocks)
+        if fee is not None:
+            return fee
+    return DEFAULT_FEE
+
+
+def create_transaction_cli(utxo_manager, mempool, ledger):
     """
     Follows the exact workflow from Section 4.1 Example Workflow.
     """
@@ -64,24 +85,26 @@ def create_transaction_cli(utxo_manager, mempool):
         print("Invalid amount.")
         return
 
-    FEE = 0.001
     inputs = []
     input_sum = 0.0
+    fee = choose_fee(mempool, 1, 2)
     for tx_id, idx, val in utxo_manager.get_utxos_for_owner(sender):
         inputs.append(Input(tx_id, idx, sender))
         input_sum += val
-        if input_sum >= (amount + FEE):
+        fee = choose_fee(mempool, len(inputs), 2)
+        if input_sum >= (amount + fee):
             break
 
     tx_id = generate_tx_id()
-    outputs = [Output(amount, recipient), Output(input_sum - amount - FEE, sender)]
+    outputs = [Output(amount, recipient), Output(input_sum - amount - fee, sender)]
     tx = Transaction(tx_id, inputs, outputs)
 
     print("Creating transaction...")
-    success, msg = mempool.add_transaction(tx, utxo_manager)
+    with ledger.write():
+        success, msg = mempool.add_transaction(tx, utxo_manager)
 
     if success:
-        print(f"Transaction valid! Fee: {FEE} BTC")
+        print(f"Transaction valid! Fee: {fee:.8f} BTC")
         print(f"Transaction ID: {tx_id}")
         print("Transaction added to mempool.")
         print(f"Mempool now has {len(mempool.transactions)} transactions.")
@@ -110,7 +133,7 @@ def view_mempool(mempool):
             )
 
 
-def mine_block_cli(mempool, utxo_manager, blockchain):
+def mine_block_cli(mempool, utxo_manager, blockchain, ledger):
     """
     Follows the mining workflow from Section 4.1.
     """
@@ -119,13 +142,14 @@ def mine_block_cli(mempool, utxo_manager, blockchain):
 
     tx_count = len(mempool.transactions)
 
-    mining.mine_block(miner, mempool, utxo_manager, blockchain)
+    with ledger.write():
+        mining.mine_block(miner, mempool, utxo_manager, blockchain)
 
     print("Block mined successfully!")
     print(f"Removed {tx_count} transactions from mempool.")
 
 
-def run_test_scenarios(utxo_manager, mempool):
+def run_test_scenarios(utxo_manager, mempool, ledger):
     print("\n--- Test Scenarios ---")
     print("1. Test 1: Basic Valid Transaction")
     print("2. Test 2: Multiple Inputs")
@@ -137,6 +161,9 @@ def run_test_scenarios(utxo_manager, mempool):
     print("8. Test 8: Race Attack Simulation")
     print("9. Test 9: Complete Mining Flow")
     print("10. Test 10: Unconfirmed Chain")
+    print("11. Test 11: Chain Reorganization")
+    print("12. Test 12: Fee Estimation")
+    print("13. Test 13: Transaction Index Reorg")
 
     try:
         choice = int(input("Select test scenario: "))
@@ -145,28 +172,35 @@ def run_test_scenarios(utxo_manager, mempool):
 
     print(f"Running Test {choice}...")
 
-    if choice == 1:
-        test_cases.test_basic_valid_tx(utxo_manager, mempool)
-    elif choice == 2:
-        test_cases.test_multiple_inputs(utxo_manager, mempool)
-    elif choice == 3:
-        test_cases.test_double_spend_same_tx(utxo_manager, mempool)
-    elif choice == 4:
-        test_cases.test_mempool_double_spend(utxo_manager, mempool)
-    elif choice == 5:
-        test_cases.test_insufficient_funds(utxo_manager, mempool)
-    elif choice == 6:
-        test_cases.test_negative_amount(utxo_manager, mempool)
-    elif choice == 7:
-        test_cases.test_zero_fee(utxo_manager, mempool)
-    elif choice == 8:
-        test_cases.test_race_attack(utxo_manager, mempool)
-    elif choice == 9:
-        test_cases.test_complete_mining_flow(utxo_manager, mempool)
-    elif choice == 10:
-        test_cases.test_unconfirmed_chain(utxo_manager, mempool)
-    else:
-        print("Invalid test choice.")
+    with ledger.write():
+        if choice == 1:
+            test_cases.test_basic_valid_tx(utxo_manager, mempool)
+        elif choice == 2:
+            test_cases.test_multiple_inputs(utxo_manager, mempool)
+        elif choice == 3:
+            test_cases.test_double_spend_same_tx(utxo_manager, mempool)
+        elif choice == 4:
+            test_cases.test_mempool_double_spend(utxo_manager, mempool)
+        elif choice == 5:
+            test_cases.test_insufficient_funds(utxo_manager, mempool)
+        elif choice == 6:
+            test_cases.test_negative_amount(utxo_manager, mempool)
+        elif choice == 7:
+            test_cases.test_zero_fee(utxo_manager, mempool)
+        elif choice == 8:
+            test_cases.test_race_attack(utxo_manager, mempool)
+        elif choice == 9:
+            test_cases.test_complete_mining_flow(utxo_manager, mempool)
+        elif choice == 10:
+            test_cases.test_unconfirmed_chain(utxo_manager, mempool)
+        elif choice == 11:
+            test_cases.test_reorg_commitment(utxo_manager, mempool)
+        elif choice == 12:
+            test_cases.test_fee_estimation(utxo_manager, mempool)
+        elif choice == 13:
+            test_cases.test_tx_index(utxo_manager, mempool)
+        else:
+            print("Invalid test choice.")
 
 
 def reset_state_for_test(utxo_manager, mempool):
@@ -177,28 +211,68 @@ def reset_state_for_test(utxo_manager, mempool):
     pass
 
 
+def get_cli_option(flag):
+    """Return the value following `flag` on the command line, or None."""
+    if flag in sys.argv:
+        idx = sys.argv.index(flag)
+        if idx + 1 < len(sys.argv):
+            return sys.argv[idx + 1]
+    return None
+
+
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if "--metrics" in sys.argv:
+        metrics.registry.enabled = True
+
     utxo_manager = UTXOManager()
-    mempool = Mempool()
-    blockchain = Blockchain(utxo_manager)
-    initialize_genesis(utxo_manager)
+    mempool = Mempool(fee_estimator=FeeEstimator())
+    blockchain = Blockchain(utxo_manager, TxIndex())
+    ledger = LedgerView(utxo_manager, mempool, blockchain)
+    mempool_file = get_cli_option("--mempool-file")
+
+    with ledger.write():
+        initialize_genesis(utxo_manager)
+
+        if mempool_file and os.path.exists(mempool_file):
+            try:
+                restored, revalidated, dropped = mempool_store.load_mempool(
+                    mempool, mempool_file, utxo_manager
+                )
+            except ValueError as exc:
+                logger.warning(
+                    "Could not reload mempool from %s (%s); starting empty.", mempool_file, exc
+                )
+            else:
+                print(
+                    f"Restored {restored} mempool transactions "
+                    f"({revalidated} revalidated, {dropped} dropped)."
+                )
+
+    if "--serve" in sys.argv:
+        host, port = QueryServer(ledger).start()
+        print(f"Query server listening on {host}:{port}")
 
     while True:
         print_menu(utxo_manager)
         choice = input("Enter choice : ").strip()
 
         if choice == "1":
-            create_transaction_cli(utxo_manager, mempool)
+            create_transaction_cli(utxo_manager, mempool, ledger)
         elif choice == "2":
             view_utxo_set(utxo_manager)
         elif choice == "3":
             view_mempool(mempool)
         elif choice == "4":
-            mine_block_cli(mempool, utxo_manager, blockchain)
+            mine_block_cli(mempool, utxo_manager, blockchain, ledger)
         elif choice == "5":
-            run_test_scenarios(utxo_manager, mempool)
+            run_test_scenarios(utxo_manager, mempool, ledger)
         elif choice == "6":
             print("Exiting...")
+            if mempool_file:
+                mempool_store.dump_mempool(mempool, mempool_file, utxo_manager)
+            if metrics.registry.enabled:
+                print(metrics.registry.to_prometheus())
             sys.exit()
         else:
             print("Invalid choice, please try again.")
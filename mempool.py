@@ -1,20 +1,34 @@
 import heapq
+import logging
+import time
 
+from metrics import registry as metrics
 from transaction import Transaction
 from utxo_manager import UTXOManager
 from validator import validate_tx
 
+logger = logging.getLogger(__name__)
+
 
 class Mempool:
-    def __init__(self, max_size=50):
+    def __init__(self, max_size=50, fee_estimator=None):
         self.transactions = []
         self.spent_utxos = set()
         self.max_size = max_size
+        self.admission_times = {}  # Maps tx_id -> time the tx entered the mempool
+        self.fee_estimator = fee_estimator  # Optional FeeEstimator fed on admission/eviction
+        self.version = 0  # Bumped on every change, so readers can tell when nothing changed
 
     def add_transaction(
         self, tx: Transaction, utxo_manager: UTXOManager
     ) -> tuple[bool, str]:
         """Validate and add transaction. Return (success, message)."""
+        with metrics.timer("mempool_add"):
+            success, msg = self._admit(tx, utxo_manager)
+        metrics.inc("mempool_accepted_total" if success else "mempool_rejected_total")
+        return success, msg
+
+    def _admit(self, tx: Transaction, utxo_manager: UTXOManager) -> tuple[bool, str]:
         validity_check = validate_tx(tx, utxo_manager, self.spent_utxos)
         if not validity_check[0]:
             return validity_check[0], validity_check[1]
@@ -32,17 +46,29 @@ class Mempool:
                     _, evicted_tx = heapq.heappop(self.transactions)
                     for inp in evicted_tx.inputs:
                         self.spent_utxos.discard((inp.prev_tx, inp.index))
-                    print(f"Evicted transaction {evicted_tx.tx_id} with fee {lowest_fee:.6f} BTC to make room for higher fee tx.")
+                    self.admission_times.pop(evicted_tx.tx_id, None)
+                    if self.fee_estimator is not None:
+                        self.fee_estimator.process_eviction(evicted_tx.tx_id)
+                    metrics.inc("mempool_evicted_total")
+                    logger.info(
+                        "Evicted transaction %s with fee %.6f BTC to make room for higher fee tx.",
+                        evicted_tx.tx_id,
+                        lowest_fee,
+                    )
                 else:
                     return False, f"Mempool is full. New tx fee ({fee:.6f}) not higher than lowest fee ({lowest_fee:.6f})"
             else:
                 return False, "Mempool is full"
 
         heapq.heappush(self.transactions, (-fee, tx))
+        self.admission_times[tx.tx_id] = time.time()
+        if self.fee_estimator is not None:
+            self.fee_estimator.process_entry(tx, fee)
 
         for inp in tx.inputs:
             self.spent_utxos.add((inp.prev_tx, inp.index))
 
+        self.version += 1
         return True, "Transaction added to MemPool"
 
     def remove_transaction(self, tx_id: str):
@@ -57,12 +83,42 @@ class Mempool:
             if tx.tx_id == tx_id:
                 for inp in tx.inputs:
                     self.spent_utxos.discard((inp.prev_tx, inp.index))
+                self.admission_times.pop(tx_id, None)
             else:
                 new_transactions.append((neg_fee, tx))
 
         if len(new_transactions) != original_len:
+            metrics.inc("mempool_removed_total")
             self.transactions = new_transactions
             heapq.heapify(self.transactions)
+            self.version += 1
+
+    def restore_entries(self, entries):
+        """
+        Bulk-insert already validated (fee, tx, admitted_at) entries without
+        re-running validate_tx. Keeps the highest-fee entries if over max_size.
+        """
+        for fee, tx, admitted_at in entries:
+            self.transactions.append((-fee, tx))
+            self.admission_times[tx.tx_id] = admitted_at
+            for inp in tx.inputs:
+                self.spent_utxos.add((inp.prev_tx, inp.index))
+
+        if len(self.transactions) > self.max_size:
+            kept = heapq.nsmallest(self.max_size, self.transactions)
+            kept_ids = {tx.tx_id for _, tx in kept}
+            for _, tx in self.transactions:
+                if tx.tx_id not in kept_ids:
+                    for inp in tx.inputs:
+                        self.spent_utxos.discard((inp.prev_tx, inp.index))
+                    self.admission_times.pop(tx.tx_id, None)
+            self.transactions = kept
+
+        heapq.heapify(self.transactions)
+        self.version += 1
+        if self.fee_estimator is not None:
+            for neg_fee, tx in self.transactions:
+                self.fee_estimator.process_entry(tx, -neg_fee)
 
     def get_top_transactions(self, n: int) -> list:
         """Return top N transactions by fee (highest first)."""
@@ -71,5 +127,10 @@ class Mempool:
 
     def clear(self):
         """Clear all transactions."""
+        if self.fee_estimator is not None:
+            for _, tx in self.transactions:
+                self.fee_estimator.untrack(tx.tx_id)
         self.transactions.clear()
         self.spent_utxos.clear()
+        self.admission_times.clear()
+        self.version += 1
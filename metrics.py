@@ -0,0 +1,207 @@
+import cProfile
+import io
+import json
+import pstats
+import sys
+import time
+
+DEFAULT_BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+
+class Counter:
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    def __init__(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+
+class _NullTimer:
+    """Shared no-op context manager returned while metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+        self.profiler = registry.profilers.get(stage)
+        self.start = 0.0
+
+    def __enter__(self):
+        if self.profiler is not None and not self._start_profiler():
+            self.profiler = None
+            self.registry.inc("profile_skipped_total")
+        self.start = time.perf_counter()
+        return self
+
+    def _start_profiler(self):
+        # Profilers cannot nest: Python 3.12+ raises ValueError, and older
+        # versions silently replace the running one. A stage timed inside
+        # another profiled stage, or under an outside profiler, is not profiled.
+        if self.registry.active_profiler is not None or sys.getprofile() is not None:
+            return False
+        try:
+            self.profiler.enable()
+        except ValueError:
+            return False
+        self.registry.active_profiler = self.profiler
+        return True
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.registry.active_profiler = None
+        self.registry.observe(f"{self.stage}_seconds", elapsed)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Counters, histograms and stage timers for the ledger hot paths.
+    Disabled by default: every recording call returns after a single flag check.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self.profilers = {}  # Maps stage -> cProfile.Profile
+        self.active_profiler = None  # The one profiler currently enabled, if any
+
+    def counter(self, name, help_text=""):
+        """Get or create a counter."""
+        if name not in self.counters:
+            self.counters[name] = Counter(name, help_text)
+        return self.counters[name]
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        """Get or create a histogram."""
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(name, help_text, buckets)
+        return self.histograms[name]
+
+    def inc(self, name, amount=1):
+        if not self.enabled:
+            return
+        self.counter(name).inc(amount)
+
+    def observe(self, name, value):
+        if not self.enabled:
+            return
+        self.histogram(name).observe(value)
+
+    def timer(self, stage):
+        """Context manager recording the duration of a stage into `<stage>_seconds`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, stage)
+
+    def enable_profiling(self, stage):
+        """
+        Run cProfile whenever the given stage is timed (requires metrics enabled).
+        Only the outermost profiled stage collects: calls nested inside it are
+        counted in profile_skipped_total instead.
+        """
+        if stage not in self.profilers:
+            self.profilers[stage] = cProfile.Profile()
+
+    def disable_profiling(self, stage):
+        self.profilers.pop(stage, None)
+
+    def profile_report(self, stage, limit=20):
+        """Return the cProfile statistics collected for a stage as text."""
+        profiler = self.profilers.get(stage)
+        if profiler is None:
+            return ""
+        out = io.StringIO()
+        try:
+            stats = pstats.Stats(profiler, stream=out)
+        except TypeError:  # Never enabled, so nothing was collected
+            return ""
+        stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def reset(self):
+        """Zero all metrics, keeping their registrations and bucket layouts."""
+        for c in self.counters.values():
+            c.value = 0
+        for h in self.histograms.values():
+            h.bucket_counts = [0] * len(h.buckets)
+            h.count = 0
+            h.sum = 0.0
+        for stage in list(self.profilers):
+            self.profilers[stage] = cProfile.Profile()
+
+    def snapshot(self) -> dict:
+        """Return all metric values as a plain dict."""
+        return {
+            "counters": {name: c.value for name, c in self.counters.items()},
+            "histograms": {
+                name: {
+                    "count": h.count,
+                    "sum": h.sum,
+                    "buckets": dict(zip(map(str, h.buckets), h.bucket_counts)),
+                }
+                for name, h in self.histograms.items()
+            },
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self) -> str:
+        """Render metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, c in sorted(self.counters.items()):
+            if c.help_text:
+                lines.append(f"# HELP {name} {c.help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {c.value}")
+
+        for name, h in sorted(self.histograms.items()):
+            if h.help_text:
+                lines.append(f"# HELP {name} {h.help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(h.buckets, h.bucket_counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {h.count}')
+            lines.append(f"{name}_sum {h.sum}")
+            lines.append(f"{name}_count {h.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the ledger components.
+registry = MetricsRegistry()
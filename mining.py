@@ -1,9 +1,13 @@
+import logging
 import random
 
 from block import Block, Blockchain
 from mempool import Mempool
+from metrics import registry as metrics
 from utxo_manager import UTXOManager
 
+logger = logging.getLogger(__name__)
+
 
 def mine_block(
     miner_address: str,
@@ -14,31 +18,14 @@ def mine_block(
 ):
     transactions_to_mine = mempool.get_top_transactions(num_txs)
     if not transactions_to_mine:
-        print("No transactions to mine.")
+        logger.info("No transactions to mine.")
         return
 
     target = 42
     nonce = 0
     while random.randint(1, 100) != target:
         nonce += 1
-    print(f"Nonce found: {nonce}")
-
-    total_fees = 0.0
-    for tx in transactions_to_mine:
-        in_sum = sum(utxo_manager.get_utxo(i.prev_tx, i.index)[0] for i in tx.inputs)
-        out_sum = sum(o.amount for o in tx.outputs)
-        total_fees += in_sum - out_sum
-
-        for inp in tx.inputs:
-            utxo_manager.remove_utxo(inp.prev_tx, inp.index)
-        for i, out in enumerate(tx.outputs):
-            utxo_manager.add_utxo(tx.tx_id, i, out.amount, out.address)
-
-        mempool.remove_transaction(tx.tx_id)
-
-    reward = total_fees
-    coinbase_id = f"coinbase_{blockchain.get_main_chain_tip()}"
-    utxo_manager.add_utxo(coinbase_id, 0, reward, miner_address)
+    logger.info("Nonce found: %d", nonce)
 
     new_block = Block(
         index=len(blockchain.main_chain),
@@ -48,4 +35,14 @@ def mine_block(
         miner=miner_address,
     )
 
+    # Spends inputs, adds outputs and the coinbase_<block_id> reward, and
+    # records undo data so a reorg can roll the block back exactly.
+    blockchain.apply_block_to_utxo(new_block)
+    for tx in transactions_to_mine:
+        mempool.remove_transaction(tx.tx_id)
+
     blockchain.add_block(new_block)
+    if mempool.fee_estimator is not None:
+        mempool.fee_estimator.process_block(transactions_to_mine)
+    metrics.inc("blocks_mined_total")
+    metrics.inc("txs_mined_total", len(transactions_to_mine))
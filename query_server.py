@@ -0,0 +1,172 @@
+"""
+Local read-only query server over a LedgerView.
+
+Protocol: one JSON request per line, one JSON response per line.
+    {"op": "balance", "owner": "Alice"}
+    {"op": "utxos", "owner": "Alice"}
+    {"op": "mempool"}
+    {"op": "tip"}
+Every response carries the snapshot generation it was answered from.
+
+Run `python query_server.py` to measure read QPS while blocks are being mined.
+"""
+
+import json
+import logging
+import random
+import socket
+import socketserver
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def handle_query(snapshot, request: dict) -> dict:
+    """Answer a single query against a snapshot."""
+    response = {"generation": snapshot.generation}
+    if not isinstance(request, dict):
+        response["error"] = "Request must be a JSON object"
+        return response
+
+    op = request.get("op")
+
+    if op == "balance":
+        response["balance"] = snapshot.get_balance(request.get("owner", ""))
+    elif op == "utxos":
+        response["utxos"] = snapshot.get_utxos_for_owner(request.get("owner", ""))
+    elif op == "mempool":
+        response["mempool"] = snapshot.view_mempool()
+    elif op == "tip":
+        response["tip"] = snapshot.tip
+        response["height"] = snapshot.height
+        response["utxo_commitment"] = snapshot.utxo_commitment
+    else:
+        response["error"] = f"Unknown op {op!r}"
+    return response
+
+
+class _QueryHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        ledger = self.server.ledger
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response = {"error": "Malformed request"}
+            else:
+                response = handle_query(ledger.snapshot(), request)
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class QueryServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, ledger, host="127.0.0.1", port=0):
+        super().__init__((host, port), _QueryHandler)
+        self.ledger = ledger
+
+    def start(self):
+        """Serve in a background thread. Returns the bound (host, port)."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self.server_address
+
+
+def measure_read_qps(address, owners, duration=2.0, clients=4):
+    """
+    Hammer the server with balance queries from several client threads.
+    Returns (total_queries, queries_per_second, generations_seen).
+    """
+    counts = [0] * clients
+    generations = set()
+    deadline = time.perf_counter() + duration
+
+    def client(slot):
+        with socket.create_connection(address) as sock:
+            stream = sock.makefile("rwb")
+            while time.perf_counter() < deadline:
+                request = {"op": "balance", "owner": random.choice(owners)}
+                stream.write(json.dumps(request).encode() + b"\n")
+                stream.flush()
+                response = json.loads(stream.readline())
+                generations.add(response["generation"])
+                counts[slot] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(counts)
+    return total, total / elapsed, len(generations)
+
+
+def _run_benchmark(duration=3.0, clients=4, num_owners=50):
+    import mining
+    from block import Blockchain
+    from fee_estimator import FeeEstimator
+    from ledger_view import LedgerView
+    from mempool import Mempool
+    from transaction import Input, Output, Transaction
+    from utxo_manager import UTXOManager
+
+    utxo_manager = UTXOManager()
+    mempool = Mempool(max_size=1000, fee_estimator=FeeEstimator())
+    blockchain = Blockchain(utxo_manager)
+    ledger = LedgerView(utxo_manager, mempool, blockchain)
+
+    owners = [f"user_{i}" for i in range(num_owners)]
+    with ledger.write():
+        for i, owner in enumerate(owners):
+            utxo_manager.add_utxo("genesis", i, 100.0, owner)
+
+    server = QueryServer(ledger)
+    address = server.start()
+    stop = threading.Event()
+    blocks = [0]
+
+    def writer():
+        seq = 0
+        while not stop.is_set():
+            with ledger.write():
+                for _ in range(5):
+                    owner = random.choice(owners)
+                    utxos = utxo_manager.get_utxos_for_owner(owner)
+                    if not utxos:
+                        continue
+                    tx_id, idx, amount = utxos[0]
+                    recipient = random.choice(owners)
+                    target = random.randint(1, 6)
+                    fee = mempool.fee_estimator.estimate_fee(1, 1, target)
+                    if fee is None:
+                        fee = random.uniform(0.00001, 0.001)
+                    tx = Transaction(
+                        f"bench_{seq}",
+                        [Input(tx_id, idx, owner)],
+                        [Output(amount - fee, recipient)],
+                    )
+                    seq += 1
+                    mempool.add_transaction(tx, utxo_manager)
+                mining.mine_block("bench_miner", mempool, utxo_manager, blockchain)
+            blocks[0] += 1
+
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    writer_thread.start()
+    total, qps, generations = measure_read_qps(address, owners, duration, clients)
+    stop.set()
+    writer_thread.join()
+    server.shutdown()
+    server.server_close()
+
+    print(f"Readers: {clients}, duration: {duration:.1f}s")
+    print(f"Queries served: {total} ({qps:.0f} QPS)")
+    print(f"Blocks connected meanwhile: {blocks[0]}, snapshot generations seen: {generations}")
+
+
+if __name__ == "__main__":
+    _run_benchmark()
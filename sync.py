@@ -0,0 +1,396 @@
+"""
+Pipelined initial sync: replay a chain of blocks from a block source.
+
+Stages:
+    read    - pull raw encoded blocks from the source (file or simulated peer)
+              in a reader thread, so source waits overlap with commits, and
+              submit each batch to the check stage
+    check   - JSON decode, stateless checks and output entry hashes, in a
+              process pool (workers > 0) or inline; workers send back only
+              plain results, never Block objects
+    commit  - decode each block once, check it against the UTXO set, apply
+              it and connect it, strictly in order
+
+There is no separate prefetch stage: UTXO lookups are plain dict reads on
+the committer, and doing them ahead of time would race with the blocks
+still being committed.
+
+The pool path does not scale with cores. Building the Block objects and
+applying them to the UTXO set is inherently serial, and that work is about
+70% of the inline CPU time. Shipping decoded blocks back does not help:
+pickling them costs more than parsing the JSON line again. Even with free
+cores, workers can save at most about 30%, and on a single core they only
+add overhead.
+
+Run `python sync.py` to measure blocks/s and stage utilization per worker count.
+"""
+
+import gc
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from block import Block, Blockchain
+from transaction import Input, Output, Transaction
+from utxo_manager import UTXOManager, utxo_entry_hash
+
+
+def encode_block(block: Block) -> str:
+    """Serialize a block as one JSON line."""
+    return json.dumps(
+        {
+            "index": block.index,
+            "prev_hash": block.prev_hash,
+            "nonce": block.nonce,
+            "miner": block.miner,
+            "transactions": [
+                {
+                    "tx_id": tx.tx_id,
+                    "inputs": [[i.prev_tx, i.index, i.owner] for i in tx.inputs],
+                    "outputs": [[o.amount, o.address] for o in tx.outputs],
+                }
+                for tx in block.transactions
+            ],
+        }
+    )
+
+
+def decode_block(line: str) -> Block:
+    return block_from_data(json.loads(line))
+
+
+def block_from_data(data: dict) -> Block:
+    """Build a Block from a JSON-decoded block."""
+    transactions = [
+        Transaction(
+            tx["tx_id"],
+            [Input(prev_tx, index, owner) for prev_tx, index, owner in tx["inputs"]],
+            [Output(amount, address) for amount, address in tx["outputs"]],
+        )
+        for tx in data["transactions"]
+    ]
+    return Block(data["index"], data["prev_hash"], transactions, data["nonce"], data["miner"])
+
+
+def check_block_stateless(data: dict) -> tuple[bool, str, list, list]:
+    """
+    Checks that need no UTXO state, on a JSON-decoded block: unique tx ids,
+    no negative outputs, no input spent twice within the block. Also hashes
+    every output for the UTXO set commitment.
+    Returns: (is_valid, message, output_sums, output_hashes)
+    """
+    seen_txs = set()
+    seen_inputs = set()
+    output_sums = []
+    output_hashes = []
+
+    for tx in data["transactions"]:
+        tx_id = tx["tx_id"]
+        if tx_id in seen_txs:
+            return False, f"Duplicate transaction {tx_id} in block", [], []
+        seen_txs.add(tx_id)
+
+        for prev_tx, index, _owner in tx["inputs"]:
+            key = (prev_tx, index)
+            if key in seen_inputs:
+                return False, f"UTXO {key} spent twice in block", [], []
+            seen_inputs.add(key)
+
+        output_sum = 0.0
+        for i, (amount, address) in enumerate(tx["outputs"]):
+            if amount < 0:
+                return False, f"Negative output amount in {tx_id}", [], []
+            output_sum += amount
+            output_hashes.append(utxo_entry_hash(tx_id, i, amount, address))
+        output_sums.append(output_sum)
+
+    return True, "Block Valid", output_sums, output_hashes
+
+
+def _check_batch(lines):
+    """
+    Pool worker: check a batch of encoded blocks.
+    Returns (results, busy_seconds), one check_block_stateless result per line.
+    """
+    start = time.perf_counter()
+    results = [check_block_stateless(json.loads(line)) for line in lines]
+    return results, time.perf_counter() - start
+
+
+class FileBlockSource:
+    """Reads one encoded block per line from a file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+class SimulatedPeer:
+    """
+    Serves pre-encoded blocks in requests of `blocks_per_request`, with an
+    optional network round trip of `latency` seconds per request.
+    """
+
+    def __init__(self, blocks, latency=0.0, blocks_per_request=16):
+        self.lines = [encode_block(b) for b in blocks]
+        self.latency = latency
+        self.blocks_per_request = blocks_per_request
+
+    def __iter__(self):
+        for i in range(0, len(self.lines), self.blocks_per_request):
+            if self.latency:
+                time.sleep(self.latency)
+            yield from self.lines[i:i + self.blocks_per_request]
+
+
+class SyncStats:
+    def __init__(self, workers):
+        self.workers = workers
+        self.blocks = 0
+        self.transactions = 0
+        self.elapsed = 0.0
+        self.committer_cpu = 0.0  # CPU seconds used by this process, excluding pool workers
+        self.busy = {"read": 0.0, "check": 0.0, "commit": 0.0}
+        self.error = None
+
+    def blocks_per_second(self):
+        return self.blocks / self.elapsed if self.elapsed else 0.0
+
+    def utilization(self):
+        """Fraction of wall time each stage was busy (check is averaged over workers)."""
+        if not self.elapsed:
+            return {stage: 0.0 for stage in self.busy}
+        util = {stage: busy / self.elapsed for stage, busy in self.busy.items()}
+        util["check"] /= max(self.workers, 1)
+        return util
+
+    def summary(self) -> str:
+        util = ", ".join(f"{stage} {u:.0%}" for stage, u in self.utilization().items())
+        line = (
+            f"workers={self.workers}: {self.blocks} blocks, {self.transactions} txs "
+            f"in {self.elapsed:.2f}s ({self.blocks_per_second():.0f} blocks/s) "
+            f"[{util}] committer CPU {self.committer_cpu:.2f}s"
+        )
+        if self.error:
+            line += f" stopped: {self.error}"
+        return line
+
+
+def _connect_block(blockchain, block, output_sums, output_hashes):
+    """Contextually check and apply one block. Returns (ok, message)."""
+    expected_prev = blockchain.get_main_chain_tip()
+    if blockchain.main_chain and block.prev_hash != expected_prev:
+        return False, f"Block {block.block_id} does not extend tip {expected_prev}"
+
+    utxo_set = blockchain.utxo_manager.utxo_set
+    # Outputs created earlier in the same block may be spent by later txs.
+    created = {}
+    for tx, output_sum in zip(block.transactions, output_sums):
+        input_sum = 0.0
+        for inp in tx.inputs:
+            key = (inp.prev_tx, inp.index)
+            utxo = created.pop(key, None) or utxo_set.get(key)
+            if utxo is None:
+                return False, f"UTXO {key} not found for {tx.tx_id}"
+            input_sum += utxo[0]
+        if output_sum > input_sum:
+            return False, f"Output sum exceeds input sum in {tx.tx_id}"
+        for i, out in enumerate(tx.outputs):
+            created[(tx.tx_id, i)] = (out.amount, out.address)
+
+    blockchain.apply_block_to_utxo(block, output_hashes)
+    blockchain.add_block(block)
+    return True, "Block connected"
+
+
+def _put(q, item, stop):
+    """Put onto a bounded queue unless the pipeline is stopping. Returns False if stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def sync_chain(source, blockchain: Blockchain, workers=0, batch_size=32) -> SyncStats:
+    """
+    Replay blocks from `source` onto `blockchain` and its UTXO manager.
+
+    A reader thread pulls batches from the source and submits them to
+    `workers` check processes (0 = check inline on the committer); the
+    calling thread commits them strictly in source order. The queue between
+    reader and committer is bounded, so reading runs at most a few batches
+    ahead. Stops at the first invalid block and reports it in SyncStats.error.
+
+    workers > 0 does not scale with cores (see the module docstring):
+    SyncStats.committer_cpu is the serial floor a pool cannot go below.
+    """
+    stats = SyncStats(workers)
+    pending = queue.Queue(maxsize=max(workers, 1) * 2)  # (lines, future or None), in order
+    stop = threading.Event()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers else None
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    def read():
+        try:
+            batch = []
+            read_start = time.perf_counter()
+            for line in source:
+                batch.append(line)
+                if len(batch) < batch_size:
+                    continue
+                stats.busy["read"] += time.perf_counter() - read_start
+                future = pool.submit(_check_batch, batch) if pool else None
+                if not _put(pending, (batch, future), stop):
+                    return
+                batch = []
+                read_start = time.perf_counter()
+            stats.busy["read"] += time.perf_counter() - read_start
+            if batch:
+                future = pool.submit(_check_batch, batch) if pool else None
+                _put(pending, (batch, future), stop)
+        except Exception as exc:
+            _put(pending, exc, stop)
+        _put(pending, None, stop)
+
+    def commit(results):
+        for line, data, (is_valid, msg, output_sums, output_hashes) in results:
+            block = block_from_data(data if data is not None else json.loads(line))
+            if not is_valid:
+                stats.error = f"Block {block.index}: {msg}"
+                return
+            ok, msg = _connect_block(blockchain, block, output_sums, output_hashes)
+            if not ok:
+                stats.error = msg
+                return
+            stats.blocks += 1
+            stats.transactions += len(block.transactions)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    # Each collector pass rescans the whole (growing) UTXO set and chain,
+    # which costs about as much as the sync itself; nothing here forms cycles.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while stats.error is None:
+            item = pending.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                stats.error = f"Unreadable block source: {item}"
+                break
+            lines, future = item
+            try:
+                if future is not None:
+                    checks, busy = future.result()
+                    datas = [None] * len(lines)
+                else:
+                    # Inline: parse each line once for both the check and the Block
+                    check_start = time.perf_counter()
+                    datas = [json.loads(line) for line in lines]
+                    checks = [check_block_stateless(data) for data in datas]
+                    busy = time.perf_counter() - check_start
+            except Exception as exc:
+                stats.error = f"Undecodable block: {exc}"
+                break
+            stats.busy["check"] += busy
+            commit_start = time.perf_counter()
+            commit(zip(lines, datas, checks))
+            stats.busy["commit"] += time.perf_counter() - commit_start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+        stop.set()
+        reader.join()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    stats.elapsed = time.perf_counter() - start
+    stats.committer_cpu = time.process_time() - cpu_start
+    return stats
+
+
+def generate_chain(num_blocks, txs_per_block, num_owners=100):
+    """Build a valid chain of fee-paying transactions. Returns (genesis_utxos, blocks)."""
+    genesis = [("genesis", i, 1000.0, f"user_{i}") for i in range(num_owners)]
+    utxos = deque(genesis)
+    blocks = []
+    prev_hash = "0"
+    seq = 0
+    for height in range(num_blocks):
+        transactions = []
+        for _ in range(txs_per_block):
+            tx_id_prev, idx, amount, owner = utxos.popleft()
+            recipient = f"user_{seq % num_owners}"
+            tx_id = f"sync_tx_{seq}"
+            seq += 1
+            half = round((amount - 0.001) / 2, 6)
+            outputs = [Output(half, recipient), Output(half, owner)]
+            transactions.append(Transaction(tx_id, [Input(tx_id_prev, idx, owner)], outputs))
+            utxos.append((tx_id, 0, half, recipient))
+            utxos.append((tx_id, 1, half, owner))
+        block = Block(height, prev_hash, transactions, height, "sync_miner")
+        blocks.append(block)
+        prev_hash = block.block_id
+    return genesis, blocks
+
+
+def _fresh_chain(genesis):
+    utxo_manager = UTXOManager()
+    for tx_id, idx, amount, owner in genesis:
+        utxo_manager.add_utxo(tx_id, idx, amount, owner)
+    return Blockchain(utxo_manager)
+
+
+def _run_benchmark(num_blocks=2000, txs_per_block=50, path="sync_bench.jsonl", latency=0.02):
+    genesis, blocks = generate_chain(num_blocks, txs_per_block)
+    with open(path, "w") as f:
+        for block in blocks:
+            f.write(encode_block(block) + "\n")
+
+    cores = os.cpu_count() or 1
+    counts = [0, 1]
+    n = 2
+    while n <= cores:
+        counts.append(n)
+        n *= 2
+
+    print(f"Replaying {num_blocks} blocks x {txs_per_block} txs from {path} ({cores} cores)")
+    for workers in counts:
+        stats = sync_chain(FileBlockSource(path), _fresh_chain(genesis), workers)
+        print(stats.summary())
+    os.remove(path)
+
+    # With a slow source the reader thread overlaps network waits with commits.
+    peer = SimulatedPeer(blocks, latency)
+    requests = -(-num_blocks // peer.blocks_per_request)
+    print(
+        f"Simulated peer, {latency * 1000:.0f} ms per {peer.blocks_per_request}-block request "
+        f"({requests * latency:.2f}s of network wait):"
+    )
+    synced = _fresh_chain(genesis)
+    stats = sync_chain(peer, synced, 0)
+    print(stats.summary())
+
+    expected = _fresh_chain(genesis)
+    for block in blocks:
+        expected.apply_block_to_utxo(block)
+    same = synced.utxo_manager.commitment() == expected.utxo_manager.commitment()
+    print(f"Commitment matches a direct replay: {same}")
+
+
+if __name__ == "__main__":
+    _run_benchmark()
@@ -1,6 +1,10 @@
 import mining
-from block import Blockchain
+from block import Block, Blockchain
+from fee_estimator import FeeEstimator, fee_rate_of
+from mempool import Mempool
 from transaction import Input, Output, Transaction
+from tx_index import TxIndex
+from utxo_manager import UTXOManager
 
 
 def test_basic_valid_tx(utxo_manager, mempool):
@@ -169,3 +173,197 @@ def test_unconfirmed_chain(utxo_manager, mempool):
     success, msg = mempool.add_transaction(tx2, utxo_manager)
     print(f"TX2 (Bob->Charlie) Result: {success}, {msg}")
     print("Explanation: Rejected because input UTXO is not yet confirmed (mined).")
+
+
+def test_reorg_commitment(utxo_manager, mempool):
+    print("Testing Chain Reorganization (UTXO Commitment Check)...")
+    mempool.clear()
+    utxo_manager.add_utxo("test11_setup", 0, 10.0, "Alice_Test11")
+    utxo_manager.add_utxo("test11_setup", 1, 10.0, "Alice_Test11")
+    test_blockchain = Blockchain(utxo_manager)
+
+    inp1 = [Input("test11_setup", 0, "Alice_Test11")]
+    out1 = [Output(9.0, "Bob_Test11")]
+    mempool.add_transaction(Transaction("tx_test11_1", inp1, out1), utxo_manager)
+    mining.mine_block("Miner_Test11", mempool, utxo_manager, test_blockchain)
+    fork_block = test_blockchain.main_chain[-1]
+    fork_state = dict(utxo_manager.utxo_set)
+
+    inp2 = [Input("test11_setup", 1, "Alice_Test11")]
+    out2 = [Output(9.0, "Charlie_Test11")]
+    mempool.add_transaction(Transaction("tx_test11_2", inp2, out2), utxo_manager)
+    mining.mine_block("Miner_Test11", mempool, utxo_manager, test_blockchain)
+    print("Main chain length before reorg:", len(test_blockchain.main_chain))
+
+    # A competing chain of two empty blocks forking after the first block
+    side1 = Block(fork_block.index + 1, fork_block.block_id, [], -1, "Miner_Test11_Side")
+    side2 = Block(fork_block.index + 2, side1.block_id, [], -2, "Miner_Test11_Side")
+    test_blockchain.add_block(side1)
+    test_blockchain.add_block(side2)
+
+    # Expected set: the state at the fork point plus the side chain's coinbases
+    expected = UTXOManager()
+    for (tx_id, index), (amount, owner) in fork_state.items():
+        expected.add_utxo(tx_id, index, amount, owner)
+    for block in (side1, side2):
+        expected.add_utxo(f"coinbase_{block.block_id}", 0, 0.0, block.miner)
+
+    print(f"New tip: {test_blockchain.get_main_chain_tip()}")
+    print(f"Fork point commitment: {fork_block.utxo_commitment}")
+    print(f"Commitment after reorg: {utxo_manager.commitment()}")
+    print(f"Expected commitment:    {expected.commitment()}")
+    tip_switched = test_blockchain.get_main_chain_tip() == side2.block_id
+    input_restored = utxo_manager.exists("test11_setup", 1)
+    matches_expected = utxo_manager.commitment() == expected.commitment()
+    matches_recompute = utxo_manager.commitment() == utxo_manager.recompute_commitment()
+    print(f"Tip switched to side chain: {tip_switched}")
+    print(f"Spent input restored: {input_restored}")
+    print(f"Commitment matches expected set: {matches_expected}")
+    print(f"Commitment matches full recompute: {matches_recompute}")
+
+    success = tip_switched and input_restored and matches_expected and matches_recompute
+    if success:
+        msg = "UTXO set after reorg matches the fork point plus the new chain."
+    else:
+        msg = "UTXO set after reorg does not match the expected state."
+    print(f"Result: {success}, {msg}")
+
+
+def test_tx_index(utxo_manager, mempool):
+    print("Testing Transaction Index across a Reorg...")
+    mempool.clear()
+    utxo_manager.add_utxo("test13_setup", 0, 10.0, "Alice_Test13")
+    tx_index = TxIndex()
+    test_blockchain = Blockchain(utxo_manager, tx_index)
+
+    tx_r1 = Transaction(
+        "tx_test13_r1",
+        [Input("test13_setup", 0, "Alice_Test13")],
+        [Output(5.0, "Alice_Test13"), Output(4.9, "Alice_Test13")],
+    )
+    mempool.add_transaction(tx_r1, utxo_manager)
+    mining.mine_block("Miner_Test13", mempool, utxo_manager, test_blockchain)
+
+    tx_a1 = Transaction(
+        "tx_test13_a1", [Input("tx_test13_r1", 0, "Alice_Test13")], [Output(4.9, "Bob_Test13")]
+    )
+    mempool.add_transaction(tx_a1, utxo_manager)
+    mining.mine_block("Miner_Test13", mempool, utxo_manager, test_blockchain)
+    fork_block = test_blockchain.main_chain[-1]
+    fork_state = dict(utxo_manager.utxo_set)
+
+    # tx_shared is mined after the fork point on both branches. Block B only
+    # spends outputs created on the chain, so the index can restore them.
+    tx_shared = Transaction(
+        "tx_test13_shared", [Input("tx_test13_r1", 1, "Alice_Test13")], [Output(4.8, "Carol_Test13")]
+    )
+    tx_b1 = Transaction(
+        "tx_test13_b1", [Input("tx_test13_a1", 0, "Bob_Test13")], [Output(4.85, "Dave_Test13")]
+    )
+    mempool.add_transaction(tx_shared, utxo_manager)
+    mempool.add_transaction(tx_b1, utxo_manager)
+    mining.mine_block("Miner_Test13", mempool, utxo_manager, test_blockchain)
+    block_b = test_blockchain.main_chain[-1]
+
+    alice = "Alice_Test13"
+    before_ok = (
+        tx_index.get_tx_location("tx_test13_shared") == (block_b.block_id, 0)
+        and tx_index.get_tx_location("tx_test13_b1") == (block_b.block_id, 1)
+        and tx_index.get_address_history(alice, 0, 2) == ["tx_test13_shared", "tx_test13_a1"]
+        and tx_index.get_address_history(alice, 2, 2) == ["tx_test13_r1"]
+        and tx_index.get_address_history(alice, 3, 2) == []
+        and test_blockchain._find_utxo_before_fork("tx_test13_a1", 0) == (4.9, "Bob_Test13")
+    )
+    print(f"Alice history, page 1: {tx_index.get_address_history(alice, 0, 2)}")
+    print(f"Alice history, page 2: {tx_index.get_address_history(alice, 2, 2)}")
+    print(f"Index correct before reorg: {before_ok}")
+
+    # Without undo data, rolling back block B must find its inputs via the index
+    block_b.spent_utxos = None
+    side1 = Block(fork_block.index + 1, fork_block.block_id, [tx_shared], -1, "Miner_Test13_Side")
+    side2 = Block(fork_block.index + 2, side1.block_id, [], -2, "Miner_Test13_Side")
+    side3 = Block(fork_block.index + 3, side2.block_id, [], -3, "Miner_Test13_Side")
+    for block in (side1, side2, side3):
+        test_blockchain.add_block(block)
+
+    after_ok = (
+        test_blockchain.get_main_chain_tip() == side3.block_id
+        and tx_index.get_tx_location("tx_test13_shared") == (side1.block_id, 0)
+        and tx_index.get_tx_location("tx_test13_a1") == (fork_block.block_id, 0)
+        and tx_index.get_tx_location("tx_test13_b1") is None
+        and tx_index.get_address_history(alice, 0, 2) == ["tx_test13_shared", "tx_test13_a1"]
+        and tx_index.get_address_history(alice, 2, 2) == ["tx_test13_r1"]
+        and tx_index.get_address_tx_count("Bob_Test13") == 1
+        and tx_index.get_address_tx_count("Dave_Test13") == 0
+    )
+    print(f"Alice history after reorg: {tx_index.get_address_history(alice)}")
+    print(f"Index correct after reorg: {after_ok}")
+
+    # Expected set: the state at the fork point with the side chain applied
+    expected = UTXOManager()
+    for (tx_id, index), (amount, owner) in fork_state.items():
+        expected.add_utxo(tx_id, index, amount, owner)
+    expected_chain = Blockchain(expected)
+    for block in (side1, side2, side3):
+        expected_chain.apply_block_to_utxo(block)
+    state_ok = utxo_manager.commitment() == expected.commitment()
+    print(f"Spent output restored from the index: {utxo_manager.exists('tx_test13_a1', 0)}")
+    print(f"UTXO set matches the fork point plus the side chain: {state_ok}")
+
+    success = before_ok and after_ok and state_ok
+    if success:
+        msg = "Index follows the reorg, and rollback without undo data used it."
+    else:
+        msg = "Index or UTXO set is wrong after the reorg."
+    print(f"Result: {success}, {msg}")
+
+
+def test_fee_estimation(utxo_manager, mempool):
+    print("Testing Fee Estimation (high-fee txs confirm, low-fee txs wait)...")
+    # A separate mempool, so the estimator only sees this scenario's traffic
+    estimator = FeeEstimator()
+    test_mempool = Mempool(max_size=200, fee_estimator=estimator)
+    test_blockchain = Blockchain(utxo_manager)
+    high_fee, low_fee = 0.0002, 0.00002
+    high_rate = fee_rate_of(high_fee, 1, 1)
+    low_rate = fee_rate_of(low_fee, 1, 1)
+
+    before = estimator.estimate_fee_rate(1)
+    print(f"Estimate before any history: {before}")
+
+    seq = 0
+    for height in range(8):
+        for fee in [high_fee] * 10 + [low_fee] * 10:
+            utxo_manager.add_utxo("test12_setup", seq, 1.0, "Alice_Test12")
+            inp = [Input("test12_setup", seq, "Alice_Test12")]
+            out = [Output(1.0 - fee, "Bob_Test12")]
+            test_mempool.add_transaction(Transaction(f"tx_test12_{seq}", inp, out), utxo_manager)
+            seq += 1
+        # Each block only has room for the ten high-fee transactions
+        mining.mine_block("Miner_Test12", test_mempool, utxo_manager, test_blockchain, num_txs=10)
+
+    after = estimator.estimate_fee_rate(1)
+    print(f"High-fee rate: {high_rate:.1f} sat/B, low-fee rate: {low_rate:.1f} sat/B")
+    print(f"Estimate for 1 block after {estimator.height} blocks: {after}")
+
+    # Every waiting tx must be counted once per target it has already missed
+    expected_waiting = [[0] * estimator.max_target for _ in estimator.bucket_bounds]
+    for bucket, entry_height in estimator.tracked.values():
+        for t in range(min(estimator.height - entry_height, estimator.max_target)):
+            expected_waiting[bucket][t] += 1
+    tracked_ok = len(estimator.tracked) == len(test_mempool.transactions)
+    waiting_ok = expected_waiting == estimator.waiting_past
+    print(f"Tracked txs match the mempool: {tracked_ok}")
+    print(f"Waiting counts match the tracked txs: {waiting_ok}")
+
+    test_mempool.clear()
+    untracked_ok = not estimator.tracked and not any(map(any, estimator.waiting_past))
+    print(f"Clearing the mempool untracks everything: {untracked_ok}")
+
+    in_range = after is not None and low_rate < after <= high_rate
+    success = before is None and in_range and tracked_ok and waiting_ok and untracked_ok
+    if success:
+        msg = "Estimate lies between the low and high fee rates."
+    else:
+        msg = "Estimator bookkeeping or estimate is wrong."
+    print(f"Result: {success}, {msg}")
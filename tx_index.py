@@ -0,0 +1,55 @@
+class TxIndex:
+    """
+    Optional transaction and address-history index for the main chain.
+
+    tx_locations maps tx_id -> (block_id, position in block).
+    address_history maps address -> list of tx_ids, in connection order.
+    Blocks are connected and disconnected in chain order, so unwinding a
+    block only ever pops from the tail of each affected history list.
+    """
+
+    def __init__(self):
+        self.tx_locations = {}
+        self.address_history = {}
+
+    @staticmethod
+    def _addresses(tx):
+        """Addresses touched by a transaction, in first-seen order."""
+        seen = {}
+        for inp in tx.inputs:
+            seen[inp.owner] = None
+        for out in tx.outputs:
+            seen[out.address] = None
+        return seen.keys()
+
+    def connect_block(self, block):
+        """Index every transaction of a block added to the main chain."""
+        for position, tx in enumerate(block.transactions):
+            self.tx_locations[tx.tx_id] = (block.block_id, position)
+            for address in self._addresses(tx):
+                self.address_history.setdefault(address, []).append(tx.tx_id)
+
+    def disconnect_block(self, block):
+        """Undo connect_block. Must be called for the current tip block."""
+        for tx in reversed(block.transactions):
+            self.tx_locations.pop(tx.tx_id, None)
+            for address in self._addresses(tx):
+                history = self.address_history.get(address)
+                if history and history[-1] == tx.tx_id:
+                    history.pop()
+                    if not history:
+                        del self.address_history[address]
+
+    def get_tx_location(self, tx_id: str):
+        """Returns (block_id, position) or None if tx is not on the main chain."""
+        return self.tx_locations.get(tx_id)
+
+    def get_address_history(self, address: str, offset: int = 0, limit: int = 50) -> list:
+        """Return up to `limit` tx_ids touching `address`, newest first, skipping `offset`."""
+        history = self.address_history.get(address, [])
+        end = max(len(history) - offset, 0)
+        start = max(end - limit, 0)
+        return history[start:end][::-1]
+
+    def get_address_tx_count(self, address: str) -> int:
+        return len(self.address_history.get(address, ()))
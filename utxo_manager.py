@@ -1,20 +1,73 @@
+import hashlib
+
+from metrics import registry as metrics
+
+COMMITMENT_MODULUS = 2**256
+
+
+def utxo_entry_hash(tx_id: str, index: int, amount: float, owner: str) -> int:
+    """SHA-256 of one UTXO entry as an integer, the unit of the set commitment."""
+    data = f"{tx_id}\x00{index}\x00{float(amount).hex()}\x00{owner}".encode()
+    return int.from_bytes(hashlib.sha256(data).digest(), "big")
+
+
 class UTXOManager:
     def __init__(self):
         self.utxo_set = {}
+        # Additive set hash: sum of entry hashes mod 2**256, updated in O(1).
+        self.commitment_value = 0
+        self.entry_hashes = {}  # Maps (tx_id, index) -> entry hash, so removal never rehashes
+        # When a dict, every change is recorded as key -> (amount, owner), or None
+        # for a removal. LedgerView uses it to publish snapshots without copying.
+        self.change_log = None
 
-    def add_utxo(self, tx_id: str, index: int, amount: float, owner: str):
-        """adds UTXO to the UTXO set"""
-        self.utxo_set[(tx_id, index)] = (amount, owner)
+    def add_utxo(self, tx_id: str, index: int, amount: float, owner: str, entry_hash=None):
+        """
+        adds UTXO to the UTXO set. `entry_hash` may be passed if it was already
+        computed with utxo_entry_hash (e.g. by a sync worker).
+        """
+        metrics.inc("utxo_add_total")
+        key = (tx_id, index)
+        old_hash = self.entry_hashes.get(key)
+        if old_hash is not None:
+            self.commitment_value -= old_hash
+        if entry_hash is None:
+            entry_hash = utxo_entry_hash(tx_id, index, amount, owner)
+        self.utxo_set[key] = (amount, owner)
+        self.entry_hashes[key] = entry_hash
+        if self.change_log is not None:
+            self.change_log[key] = (amount, owner)
+        self.commitment_value = (self.commitment_value + entry_hash) % COMMITMENT_MODULUS
 
     def remove_utxo(self, tx_id: str, index: int) -> bool:
         """removes utxos from the set. Returns True if successful, False otherwise."""
         if self.exists(tx_id, index):
-            self.utxo_set.pop((tx_id, index))
+            key = (tx_id, index)
+            del self.utxo_set[key]
+            if self.change_log is not None:
+                self.change_log[key] = None
+            self.commitment_value = (
+                self.commitment_value - self.entry_hashes.pop(key)
+            ) % COMMITMENT_MODULUS
+            metrics.inc("utxo_remove_total")
             return True
+        metrics.inc("utxo_remove_missing_total")
         return False
 
+    def commitment(self) -> str:
+        """Hex digest of the current UTXO set commitment (O(1))."""
+        return f"{self.commitment_value:064x}"
+
+    def recompute_commitment(self) -> str:
+        """Recompute the commitment from every entry (O(set size)), for auditing."""
+        total = 0
+        for (tx_id, index), (amount, owner) in self.utxo_set.items():
+            total += utxo_entry_hash(tx_id, index, amount, owner)
+        return f"{total % COMMITMENT_MODULUS:064x}"
+
     def get_balance(self, owner: str):
         """Calculate total balance for an address ."""
+        metrics.inc("utxo_balance_query_total")
         sum = 0
 
         for amount, utxo_owner in self.utxo_set.values():
@@ -1,3 +1,4 @@
+from metrics import registry as metrics
 from transaction import Transaction
 from utxo_manager import UTXOManager
 
@@ -9,6 +10,15 @@ def validate_tx(
     Validates a transaction against the UTXO set and mempool state.
     Returns: (is_valid, message, fee)
     """
+    with metrics.timer("validate_tx"):
+        result = _check_tx(tx, utxo_manager, mempool_spent_utxos)
+    metrics.inc("validate_tx_valid_total" if result[0] else "validate_tx_invalid_total")
+    return result
+
+
+def _check_tx(
+    tx: Transaction, utxo_manager: UTXOManager, mempool_spent_utxos: set
+) -> tuple[bool, str, float]:
     tx_utxos = set()
     input_sum = 0.0
 